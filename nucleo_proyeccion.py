@@ -0,0 +1,128 @@
+"""Núcleo numérico de la proyección financiera.
+
+Vive en un módulo aparte porque Streamlit vuelve a ejecutar el script principal
+en cada interacción: aquí los kernels de numba se compilan (o se cargan de la
+caché en disco) una sola vez por proceso, al importar el módulo.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    from numba.types import float64, int64
+    NUMBA_DISPONIBLE = True
+except ImportError:  # numba es opcional: sin él los kernels corren como Python normal
+    NUMBA_DISPONIBLE = False
+    
+    def njit(*args, **kwargs):
+        return lambda funcion: funcion
+
+# Firmas de los kernels, compilados al importar para no pagar la compilación
+# en la primera interacción. En el kernel mensual los precios pueden ser
+# enteros (widgets) o decimales (análisis de sensibilidad)
+if NUMBA_DISPONIBLE:
+    _FIRMAS = [
+        (int64, int64, int64, precio_premium, precio_basica, float64,
+         int64[::1], int64[::1], int64, float64, float64)
+        for precio_premium in (int64, float64)
+        for precio_basica in (int64, float64)
+    ]
+    # El barrido recibe los valores base como decimales: numba convierte los
+    # enteros de los widgets al llamar
+    _FIRMA_SENSIBILIDAD = [
+        (int64, float64[::1], int64, int64, int64, float64, float64, float64,
+         int64[::1], int64[::1], int64, float64, float64, float64)
+    ]
+else:
+    _FIRMAS = []
+    _FIRMA_SENSIBILIDAD = []
+
+@njit(_FIRMAS, cache=True)
+def proyeccion_mensual(
+    meses, usuarios_premium_inicio, usuarios_basica_inicio,
+    precio_premium, precio_basica, crecimiento_mensual,
+    sueldos_vec, gracia_vec, costos_fijos_total, costo_variable,
+    tasa_impuestos
+):
+    """Calcula las series base de la proyección mes a mes"""
+    
+    usuarios_premium = np.empty(meses, np.int64)
+    usuarios_basicos = np.empty(meses, np.int64)
+    costos_personal = np.zeros(meses, sueldos_vec.dtype)
+    
+    # Usuarios y costos de personal de cada mes
+    crecimiento = 1.0
+    for k in range(meses):
+        if k > 0:
+            crecimiento *= 1.0 + crecimiento_mensual
+        usuarios_premium[k] = round(usuarios_premium_inicio * crecimiento)
+        usuarios_basicos[k] = round(usuarios_basica_inicio * crecimiento)
+        for r in range(sueldos_vec.shape[0]):
+            if k + 1 > gracia_vec[r]:
+                costos_personal[k] += sueldos_vec[r]
+    
+    ingresos_premium = usuarios_premium * precio_premium
+    ingresos_basicos = usuarios_basicos * precio_basica
+    costos_variables = (usuarios_premium + usuarios_basicos) * costo_variable
+    
+    # Utilidades e impuestos de cada mes
+    utilidad_bruta = np.empty(meses)
+    impuestos = np.zeros(meses)
+    for k in range(meses):
+        utilidad_bruta[k] = (ingresos_premium[k] + ingresos_basicos[k]) - (
+            (costos_personal[k] + costos_fijos_total) + costos_variables[k]
+        )
+        if utilidad_bruta[k] > 0:
+            impuestos[k] = utilidad_bruta[k] * (tasa_impuestos / 100)
+    
+    return (
+        usuarios_premium, usuarios_basicos, ingresos_premium, ingresos_basicos,
+        costos_personal, costos_variables, utilidad_bruta, impuestos
+    )
+
+# Parámetros que admite el análisis de sensibilidad, en el orden en que los
+# identifica sensibilidad_final
+PARAMETROS_SENSIBILIDAD = ('precio_premium', 'precio_basica', 'crecimiento_mensual', 'costo_variable')
+
+@njit(_FIRMA_SENSIBILIDAD, cache=True)
+def sensibilidad_final(
+    parametro, valores, meses, usuarios_premium_inicio, usuarios_basica_inicio,
+    precio_premium, precio_basica, crecimiento_mensual,
+    sueldos_vec, gracia_vec, costos_fijos_total, costo_variable,
+    inversion_inicial, tasa_impuestos
+):
+    """Calcula la utilidad, el efectivo y el ROI del último mes para cada valor del parámetro"""
+    
+    n = valores.shape[0]
+    utilidad_final = np.empty(n)
+    efectivo_final = np.empty(n)
+    roi_final = np.zeros(n)
+    
+    # Con numba todo el barrido es una sola llamada compilada; solo se guarda el último mes
+    for i in range(n):
+        pp = float(precio_premium)
+        pb = float(precio_basica)
+        crecimiento = float(crecimiento_mensual)
+        cv = float(costo_variable)
+        if parametro == 0:
+            pp = valores[i]
+        elif parametro == 1:
+            pb = valores[i]
+        elif parametro == 2:
+            crecimiento = valores[i]
+        else:
+            cv = valores[i]
+        
+        _, _, _, _, _, _, utilidad_bruta, impuestos = proyeccion_mensual(
+            meses, usuarios_premium_inicio, usuarios_basica_inicio,
+            pp, pb, crecimiento,
+            sueldos_vec, gracia_vec, costos_fijos_total, cv,
+            tasa_impuestos
+        )
+        utilidad_neta = utilidad_bruta - impuestos
+        utilidad_final[i] = utilidad_neta[-1]
+        efectivo_final[i] = utilidad_neta.sum() + inversion_inicial
+        if inversion_inicial > 0:
+            roi_final[i] = (efectivo_final[i] - inversion_inicial) / inversion_inicial
+    
+    return utilidad_final, efectivo_final, roi_final
@@ -5,8 +5,17 @@ import plotly.express as px
 import plotly.graph_objects as go
 from io import BytesIO
 from datetime import datetime
+from types import MappingProxyType
+from typing import NamedTuple
 import json
 
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa el módulo json estándar
+    orjson = None
+
+from nucleo_proyeccion import PARAMETROS_SENSIBILIDAD, proyeccion_mensual, sensibilidad_final
+
 # ================================
 # CONFIGURACIÓN Y ESTILOS
 # ================================
@@ -34,21 +43,6 @@ st.markdown("""
         box-shadow: 0 8px 32px rgba(31, 38, 135, 0.37);
     }
     
-    .metric-card { 
-        background: linear-gradient(145deg, #ffffff, #f0f0f0);
-        border-radius: 15px; 
-        padding: 20px; 
-        margin: 10px 0;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-        border: 1px solid rgba(255,255,255,0.2);
-        transition: transform 0.3s ease;
-    }
-    
-    .metric-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 8px 25px rgba(0,0,0,0.15);
-    }
-    
     .positive { color: #28a745; font-weight: bold; }
     .negative { color: #dc3545; font-weight: bold; }
     .warning { color: #ffc107; font-weight: bold; }
@@ -108,6 +102,66 @@ st.markdown("""
 # FUNCIONES AUXILIARES
 # ================================
 
+# Roles del equipo: nombre, cantidad de personas y sueldo mensual propuesto por defecto
+_ROLES = (
+    ("CEO", 1, 0),
+    ("CTO", 1, 0),
+    ("Dev Fullstack", 2, 2800),
+    ("Diseñador UX/UI", 1, 1000),
+    ("Growth Marketer", 1, 1000),
+    ("Soporte", 1, 1800),
+    ("Sales Manager", 2, 0),
+    ("CFO", 1, 0)
+)
+
+# Columnas de la proyección expresadas en dinero y en porcentaje
+_COLS_MONEDA = (
+    'Ingresos_Premium', 'Ingresos_Basicos', 'Ingresos_Totales',
+    'Costos_Personal', 'Costos_Fijos', 'Costos_Variables', 'Costos_Totales',
+    'Utilidad_Bruta', 'Impuestos', 'Utilidad_Neta', 'Flujo_Efectivo', 'Efectivo_Acumulado'
+)
+_COLS_PORCENTAJE = ('Margen_Bruto', 'Margen_Neto', 'ROI_Acumulado')
+
+# Columnas de la tabla detallada que se escalan a miles o millones
+_COLS_FORMATO = (
+    'Ingresos_Totales', 'Costos_Totales', 'Utilidad_Neta',
+    'Efectivo_Acumulado', 'Costos_Personal', 'Costos_Variables', 'Costo_Inversion_Inicial'
+)
+
+# Parámetros del análisis de sensibilidad: clave del modelo y rango como
+# fracción del valor actual (desde, hasta)
+_SENSIBILIDAD = MappingProxyType({
+    "Precio Premium": ('precio_premium', 0.5, 1.5),
+    "Precio Básico": ('precio_basica', 0.5, 1.5),
+    "Crecimiento Mensual": ('crecimiento_mensual', 0.0, 2.0),
+    "Costo Variable": ('costo_variable', 0.0, 2.0)
+})
+
+# Mensaje por estado del negocio (0 saludable, 1 en crecimiento, 2 requiere
+# ajustes): alerta del resumen y recomendación del reporte exportado
+_ESTADO_HTML = (
+    '<div class="alert-success">✅ <strong>Estado: SALUDABLE</strong> - El modelo es rentable y sostenible.</div>',
+    '<div class="alert-success">⚠️ <strong>Estado: EN CRECIMIENTO</strong> - Rentable pero requiere gestión de capital.</div>',
+    '<div class="alert-danger">🚨 <strong>Estado: REQUIERE AJUSTES</strong> - El modelo necesita optimización.</div>'
+)
+_RECOMENDACION_MD = (
+    "✅ **Modelo financiero saludable y sostenible**\n",
+    "⚠️ **Modelo rentable pero requiere gestión de capital**\n",
+    "🚨 **Modelo requiere optimización urgente**\n"
+)
+
+class CostosFijos(NamedTuple):
+    """Costos fijos mensuales por concepto; al ser una tupla sirve como clave de caché"""
+    infraestructura: int
+    legales: int
+    appstore: int
+    marketing: int
+    otros: int
+    
+    @property
+    def total(self):
+        return sum(self)
+
 def validate_inputs():
     """Valida las entradas del usuario"""
     errors = []
@@ -127,7 +181,17 @@ def validate_inputs():
     
     return errors, warnings_list
 
-@st.cache_data(ttl=3600)
+
+def _vectores_equipo(sueldos, gracia):
+    """Convierte sueldos y gracia por rol en vectores alineados con _ROLES"""
+    sueldos, gracia = dict(sueldos), dict(gracia)
+    sueldos_vec = np.array(
+        [sueldos[rol] * cantidad for rol, cantidad, _ in _ROLES], dtype=np.int64
+    )
+    gracia_vec = np.array([gracia.get(rol, 0) for rol, _, _ in _ROLES], dtype=np.int64)
+    return sueldos_vec, gracia_vec
+
+@st.cache_data(max_entries=64, show_spinner=False)
 def calcular_proyeccion_financiera(
     meses, usuarios_premium_inicio, usuarios_basica_inicio, 
     precio_premium, precio_basica, crecimiento_mensual,
@@ -136,83 +200,103 @@ def calcular_proyeccion_financiera(
 ):
     """Calcula la proyección financiera optimizada"""
     
-    # Crear DataFrame base
-    df = pd.DataFrame(index=range(1, meses + 1))
-    df.index.name = 'Mes'
-    
-    # Cálculo de usuarios con crecimiento compuesto
-    df['Usuarios_Premium'] = np.round(
-        usuarios_premium_inicio * (1 + crecimiento_mensual) ** (df.index - 1)
-    ).astype(int)
-    
-    df['Usuarios_Basicos'] = np.round(
-        usuarios_basica_inicio * (1 + crecimiento_mensual) ** (df.index - 1)
-    ).astype(int)
-    
-    df['Total_Usuarios'] = df['Usuarios_Premium'] + df['Usuarios_Basicos']
-    
-    # Cálculo de ingresos
-    df['Ingresos_Premium'] = df['Usuarios_Premium'] * precio_premium
-    df['Ingresos_Basicos'] = df['Usuarios_Basicos'] * precio_basica
-    df['Ingresos_Totales'] = df['Ingresos_Premium'] + df['Ingresos_Basicos']
-    
-    # Cálculo de costos de personal (considerando período de gracia)
-    costos_personal_por_mes = []
-    for mes in df.index:
-        costo_mes = sum([
-            sueldos[rol] * cantidad if mes > gracia.get(rol, 0) else 0
-            for rol, cantidad in [
-                ("CEO", 1),
-                ("CTO", 1),
-                ("Dev Fullstack", 2),
-                ("Diseñador UX/UI", 1),
-                ("Growth Marketer", 1),
-                ("Soporte", 1),
-                ("Sales Manager", 2),
-                ("CFO", 1)
-            ]
-        ])
-        costos_personal_por_mes.append(costo_mes)
-    
-    df['Costos_Personal'] = costos_personal_por_mes
-    df['Costos_Fijos'] = df['Costos_Personal'] + costos_fijos['total']
-    df['Costos_Variables'] = df['Total_Usuarios'] * costo_variable
-    df['Costos_Totales'] = df['Costos_Fijos'] + df['Costos_Variables']
-    
-    # Cálculo de utilidades
-    df['Utilidad_Bruta'] = df['Ingresos_Totales'] - df['Costos_Totales']
-    df['Impuestos'] = np.where(
-        df['Utilidad_Bruta'] > 0, 
-        df['Utilidad_Bruta'] * (tasa_impuestos / 100), 
-        0
+    # sueldos y gracia llegan como tuplas (clave, valor)
+    costos_fijos_total = costos_fijos.total
+    sueldos_vec, gracia_vec = _vectores_equipo(sueldos, gracia)
+    
+    (
+        usuarios_premium, usuarios_basicos, ingresos_premium, ingresos_basicos,
+        costos_personal, costos_variables, utilidad_bruta, impuestos
+    ) = proyeccion_mensual(
+        meses, usuarios_premium_inicio, usuarios_basica_inicio,
+        precio_premium, precio_basica, crecimiento_mensual,
+        sueldos_vec, gracia_vec, costos_fijos_total, costo_variable,
+        tasa_impuestos
     )
-    df['Utilidad_Neta'] = df['Utilidad_Bruta'] - df['Impuestos']
+    
+    total_usuarios = usuarios_premium + usuarios_basicos
+    ingresos_totales = ingresos_premium + ingresos_basicos
+    costos_fijos_mes = costos_personal + costos_fijos_total
+    costos_totales = costos_fijos_mes + costos_variables
+    utilidad_neta = utilidad_bruta - impuestos
     
     # Flujo de efectivo y métricas
-    df['Flujo_Efectivo'] = df['Utilidad_Neta']
-    df['Efectivo_Acumulado'] = df['Flujo_Efectivo'].cumsum() + inversion_inicial
-    
-    # Métricas financieras
-    df['Margen_Bruto'] = np.where(
-        df['Ingresos_Totales'] > 0,
-        df['Utilidad_Bruta'] / df['Ingresos_Totales'],
-        0
+    efectivo_acumulado = utilidad_neta.cumsum()
+    efectivo_acumulado += inversion_inicial
+    
+    # Métricas financieras: la división solo se evalúa en los meses con
+    # ingresos, el resto queda en 0
+    con_ingresos = ingresos_totales > 0
+    margen_bruto = np.divide(
+        utilidad_bruta, ingresos_totales,
+        out=np.zeros(meses), where=con_ingresos
     )
-    
-    df['Margen_Neto'] = np.where(
-        df['Ingresos_Totales'] > 0,
-        df['Utilidad_Neta'] / df['Ingresos_Totales'],
-        0
+    margen_neto = np.divide(
+        utilidad_neta, ingresos_totales,
+        out=np.zeros(meses), where=con_ingresos
     )
     
-    df['ROI_Acumulado'] = np.where(
-        inversion_inicial > 0,
-        (df['Efectivo_Acumulado'] - inversion_inicial) / inversion_inicial,
-        0
+    if inversion_inicial > 0:
+        roi_acumulado = efectivo_acumulado - inversion_inicial
+        roi_acumulado /= inversion_inicial
+    else:
+        roi_acumulado = np.zeros(meses)
+    
+    # Se construye el DataFrame una sola vez con todas las columnas
+    return pd.DataFrame({
+        'Mes': np.arange(1, meses + 1),
+        'Usuarios_Premium': usuarios_premium,
+        'Usuarios_Basicos': usuarios_basicos,
+        'Total_Usuarios': total_usuarios,
+        'Ingresos_Premium': ingresos_premium,
+        'Ingresos_Basicos': ingresos_basicos,
+        'Ingresos_Totales': ingresos_totales,
+        'Costos_Personal': costos_personal,
+        'Costos_Fijos': costos_fijos_mes,
+        'Costos_Variables': costos_variables,
+        'Costos_Totales': costos_totales,
+        'Utilidad_Bruta': utilidad_bruta,
+        'Impuestos': impuestos,
+        'Utilidad_Neta': utilidad_neta,
+        'Flujo_Efectivo': utilidad_neta,
+        'Efectivo_Acumulado': efectivo_acumulado,
+        'Margen_Bruto': margen_bruto,
+        'Margen_Neto': margen_neto,
+        'ROI_Acumulado': roi_acumulado
+    })
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def calcular_sensibilidad(
+    param_key, factor_desde, factor_hasta, meses, usuarios_premium_inicio, usuarios_basica_inicio,
+    precio_premium, precio_basica, crecimiento_mensual,
+    sueldos, gracia, costos_fijos, costo_variable,
+    inversion_inicial, tasa_impuestos
+):
+    """Calcula los resultados finales de la proyección en el rango del parámetro"""
+    
+    sueldos_vec, gracia_vec = _vectores_equipo(sueldos, gracia)
+    parametro = PARAMETROS_SENSIBILIDAD.index(param_key)
+    # El crecimiento se muestra en porcentaje pero el modelo lo usa como fracción
+    base_value = (precio_premium, precio_basica, crecimiento_mensual * 100, costo_variable)[parametro]
+    valores = np.linspace(base_value * factor_desde, base_value * factor_hasta, 11)
+    valores_modelo = valores / 100 if param_key == 'crecimiento_mensual' else valores
+    
+    utilidad_final, efectivo_final, roi_final = sensibilidad_final(
+        parametro, valores_modelo,
+        meses, usuarios_premium_inicio, usuarios_basica_inicio,
+        precio_premium, precio_basica, crecimiento_mensual,
+        sueldos_vec, gracia_vec, costos_fijos.total, costo_variable,
+        inversion_inicial, tasa_impuestos
     )
     
-    return df.reset_index()
+    return pd.DataFrame({
+        'Parámetro': valores,
+        'Utilidad_Final': utilidad_final,
+        'Efectivo_Final': efectivo_final,
+        'ROI_Final': roi_final
+    })
 
+@st.cache_data
 def crear_graficos_principales(df):
     """Crea los gráficos principales del dashboard"""
     
@@ -295,14 +379,161 @@ def crear_graficos_principales(df):
     
     return fig1, fig2, fig3
 
-def generar_reporte_ejecutivo(df):
+@st.cache_data
+def crear_grafico_flujo_efectivo(mes, efectivo):
+    """Crea el gráfico de evolución del efectivo acumulado a partir de los arreglos por mes"""
+    
+    fig = go.Figure()
+    
+    # Una sola comparación sobre el arreglo; el tramo negativo es su complemento
+    positivo = efectivo >= 0
+    negativo = ~positivo
+    
+    if positivo.any():
+        fig.add_trace(go.Scatter(
+            x=mes[positivo],
+            y=efectivo[positivo],
+            fill='tozeroy', fillcolor='rgba(40, 167, 69, 0.3)',
+            line=dict(color='#28a745'), name='Efectivo Positivo',
+            hovertemplate='<b>Efectivo Acumulado</b><br>Mes %{x}<br>$%{y:,.0f}<extra></extra>'
+        ))
+    if negativo.any():
+        fig.add_trace(go.Scatter(
+            x=mes[negativo],
+            y=efectivo[negativo],
+            fill='tozeroy', fillcolor='rgba(220, 53, 69, 0.3)',
+            line=dict(color='#dc3545'), name='Efectivo Negativo',
+            hovertemplate='<b>Efectivo Acumulado</b><br>Mes %{x}<br>$%{y:,.0f}<extra></extra>'
+        ))
+    fig.add_hline(y=0, line_dash="dash", line_color="black", opacity=0.5)
+    fig.update_layout(
+        title='💰 Evolución del Flujo de Efectivo Acumulado',
+        xaxis_title='Mes',
+        yaxis_title='Efectivo Acumulado (USD)',
+        template='plotly_white',
+        height=400,
+        showlegend=True
+    )
+    
+    return fig
+
+@st.cache_data
+def calcular_estadisticas(df):
+    """Calcula las estadísticas descriptivas de la proyección completa"""
+    stats_df = pd.DataFrame({
+        'Ingresos Totales': df['Ingresos_Totales'].describe(),
+        'Costos Totales': df['Costos_Totales'].describe(),
+        'Utilidad Neta': df['Utilidad_Neta'].describe()
+    }).round(0)
+    stats_df2 = pd.DataFrame({
+        'Total Usuarios': df['Total_Usuarios'].describe(),
+        'Margen Bruto (%)': (df['Margen_Bruto'] * 100).describe(),
+        'ROI Acumulado (%)': (df['ROI_Acumulado'] * 100).describe()
+    }).round(1)
+    return stats_df, stats_df2
+
+@st.cache_data
+def fechas_proyeccion(meses):
+    """Genera el cierre de cada mes de la proyección a partir de enero de 2024"""
+    return pd.date_range(start='2024-01-01', periods=meses, freq='ME').to_numpy()
+
+@st.cache_data(max_entries=64)
+def generar_reporte_md(
+    parametros, resultados, break_even,
+    meses_negativos, max_perdida, efectivo_minimo, estado_negocio
+):
+    """Genera el cuerpo del reporte exportable en markdown, sin la fecha de generación"""
+    
+    (
+        meses, usuarios_premium_inicio, usuarios_basica_inicio,
+        precio_premium, precio_basica, crecimiento_mensual, inversion_inicial
+    ) = parametros
+    (
+        usuarios_finales, ingresos_finales, utilidad_final,
+        efectivo_final, roi_final, margen_neto_final
+    ) = resultados
+    
+    if break_even is not None:
+        mes_break_even, usuarios_break_even = break_even
+        punto_equilibrio = (
+            f"- **Mes de break-even**: {mes_break_even}\n"
+            f"- **Usuarios necesarios**: {usuarios_break_even:,}\n"
+        )
+    else:
+        punto_equilibrio = "- **Break-even**: No alcanzado en el período\n"
+    
+    return f"""
+## RESUMEN EJECUTIVO
+
+### Parámetros del Modelo
+- **Duración**: {meses} meses
+- **Usuarios iniciales**: {usuarios_premium_inicio:,} Premium + {usuarios_basica_inicio:,} Básicos
+- **Precios**: ${precio_premium} Premium / ${precio_basica} Básico
+- **Crecimiento mensual**: {crecimiento_mensual:.1%}
+- **Inversión inicial**: ${inversion_inicial:,}
+
+### Resultados Clave
+- **Usuarios finales proyectados**: {usuarios_finales:,}
+- **Ingresos mensuales finales**: ${ingresos_finales:,}
+- **Utilidad mensual final**: ${utilidad_final:,}
+- **Efectivo acumulado final**: ${efectivo_final:,}
+- **ROI total**: {roi_final:.1%}
+- **Margen neto final**: {margen_neto_final:.1%}
+
+### Punto de Equilibrio
+{punto_equilibrio}
+### Análisis de Riesgo
+- **Meses con pérdidas**: {meses_negativos}
+- **Pérdida máxima mensual**: ${abs(max_perdida):,}
+- **Efectivo mínimo**: ${efectivo_minimo:,}
+
+### Recomendaciones
+{_RECOMENDACION_MD[estado_negocio]}"""
+
+def serializar_configuracion(config):
+    """Serializa la configuración del modelo a JSON con sangría de dos espacios"""
+    if orjson is not None:
+        return orjson.dumps(config, option=orjson.OPT_INDENT_2)
+    return json.dumps(config, indent=2, ensure_ascii=False).encode('utf-8')
+
+@st.cache_data
+def generar_csv(export_df):
+    """Genera el archivo CSV con la proyección completa"""
+    csv_buffer = BytesIO()
+    export_df.to_csv(csv_buffer, index=False, encoding='utf-8')
+    return csv_buffer.getvalue()
+
+@st.cache_data
+def generar_excel(export_df, params_df):
+    """Genera el archivo Excel con la proyección y los parámetros del modelo"""
+    excel_buffer = BytesIO()
+    with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
+        export_df.to_excel(writer, sheet_name='Proyección Financiera', index=False)
+        params_df.to_excel(writer, sheet_name='Parámetros', index=False)
+        
+        # Formato numérico por columna: las celdas siguen siendo números en Excel
+        hoja = writer.sheets['Proyección Financiera']
+        formato_moneda = writer.book.add_format({'num_format': '$#,##0.00'})
+        formato_porcentaje = writer.book.add_format({'num_format': '0.0%'})
+        for i, col in enumerate(export_df.columns):
+            if col in _COLS_MONEDA:
+                hoja.set_column(i, i, 18, formato_moneda)
+            elif col in _COLS_PORCENTAJE:
+                hoja.set_column(i, i, 14, formato_porcentaje)
+    return excel_buffer.getvalue()
+
+def _break_even(df):
+    """Devuelve la posición del primer mes con utilidad neta positiva, o None si no se alcanza"""
+    utilidad_positiva = df['Utilidad_Neta'].to_numpy() > 0
+    return int(utilidad_positiva.argmax()) if utilidad_positiva.any() else None
+
+def generar_reporte_ejecutivo(df, fila_break_even, ultimo_mes):
     """Genera un reporte ejecutivo en markdown con explicación de la inversión inicial"""
     
-    # Encontrar el mes de break-even
-    try:
-        break_even_mes = df[df['Utilidad_Neta'] > 0]['Mes'].iloc[0]
-        break_even_text = f"Mes {break_even_mes}"
-    except IndexError:
+    # Mes de break-even (primer mes con utilidad positiva)
+    if fila_break_even is not None:
+        break_even_text = f"Mes {df['Mes'].iat[fila_break_even]}"
+    else:
         break_even_text = "No alcanzado en el período"
     
     # Calcular métricas clave
@@ -318,15 +549,15 @@ def generar_reporte_ejecutivo(df):
     
     **📈 Métricas de Crecimiento:**
     - Crecimiento promedio mensual: {crecimiento_promedio:.1f}%
-    - Usuarios finales proyectados: {df['Total_Usuarios'].iloc[-1]:,}
+    - Usuarios finales proyectados: {ultimo_mes['Total_Usuarios']:,}
     
     **💰 Métricas Financieras:**
     - LTV estimado por usuario: ${ltv_estimado:.0f}
-    - Margen neto final: {df['Margen_Neto'].iloc[-1]:.1%}
-    - ROI total del proyecto: {df['ROI_Acumulado'].iloc[-1]:.1%}
+    - Margen neto final: {ultimo_mes['Margen_Neto']:.1%}
+    - ROI total del proyecto: {ultimo_mes['ROI_Acumulado']:.1%}
     
     **💵 Flujo de Caja:**
-    - Efectivo final proyectado: ${df['Efectivo_Acumulado'].iloc[-1]:,}
+    - Efectivo final proyectado: ${ultimo_mes['Efectivo_Acumulado']:,}
     - Mejor mes (utilidad): ${df['Utilidad_Neta'].max():,}
     - Peor mes (utilidad): ${df['Utilidad_Neta'].min():,}
     
@@ -352,84 +583,83 @@ st.markdown('<p class="subtitle">Proyección Financiera Interactiva</p>', unsafe
 with st.sidebar:
     st.markdown("## ⚙️ CONFIGURACIÓN DEL MODELO")
     
-    # Sección 1: Período y Precios
-    with st.expander("📅 PERÍODO Y PRECIOS", expanded=True):
-        meses = st.slider("Duración del modelo (meses)", 12, 60, 36, 
-                         help="Horizonte de proyección financiera")
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            precio_premium = st.number_input("💰 Precio Premium ($)", 1, 200, 99, 
-                                           help="Precio mensual suscripción premium")
-        with col2:
-            precio_basica = st.number_input("💵 Precio Básico ($)", 1, 200, 9, 
-                                          help="Precio mensual suscripción básica")
-        
-        crecimiento_mensual = st.slider("📈 Crecimiento usuarios/mes (%)", 
-                                       0.0, 50.0, 12.0, step=0.5) / 100
-    
-    # Sección 2: Usuarios Iniciales
-    with st.expander("👥 BASE DE USUARIOS", expanded=True):
-        col1, col2 = st.columns(2)
-        with col1:
-            usuarios_premium_inicio = st.number_input("👑 Premium iniciales", 0, 50000, 15)
-        with col2:
-            usuarios_basica_inicio = st.number_input("👤 Básicos iniciales", 0, 50000, 30)
-    
-    # Sección 3: Equipo y Sueldos
-    with st.expander("👨‍💼 EQUIPO Y NÓMINA"):
-        roles_data = {
-            "CEO": 0, "CTO": 0, "Dev Fullstack": 2800,
-            "Diseñador UX/UI": 1000, "Growth Marketer": 1000,
-            "Soporte": 1800, "Sales Manager": 0, "CFO": 0
-        }
-        
-        sueldos = {}
-        gracia = {}
+    # Los parámetros se aplican todos juntos al pulsar el botón, así una serie
+    # de ajustes provoca un único recálculo en lugar de uno por cada widget
+    with st.form("parametros_modelo"):
+        # Sección 1: Período y Precios
+        with st.expander("📅 PERÍODO Y PRECIOS", expanded=True):
+            meses = st.slider("Duración del modelo (meses)", 12, 60, 36, 
+                             help="Horizonte de proyección financiera")
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                precio_premium = st.number_input("💰 Precio Premium ($)", 1, 200, 99, 
+                                               help="Precio mensual suscripción premium")
+            with col2:
+                precio_basica = st.number_input("💵 Precio Básico ($)", 1, 200, 9, 
+                                              help="Precio mensual suscripción básica")
+            
+            crecimiento_mensual = st.slider("📈 Crecimiento usuarios/mes (%)", 
+                                           0.0, 50.0, 12.0, step=0.5) / 100
         
-        for rol, sueldo_base in roles_data.items():
-            st.markdown(f"**{rol}**")
+        # Sección 2: Usuarios Iniciales
+        with st.expander("👥 BASE DE USUARIOS", expanded=True):
             col1, col2 = st.columns(2)
             with col1:
-                sueldos[rol] = st.number_input(
-                    f"Sueldo", 0, 20000, sueldo_base, 
-                    key=f"sueldo_{rol}", help=f"Sueldo mensual para {rol}"
-                )
+                usuarios_premium_inicio = st.number_input("👑 Premium iniciales", 0, 50000, 15)
             with col2:
-                gracia_default = 0 if rol == "CEO" else 0
-                gracia[rol] = st.number_input(
-                    f"Gracia (meses)", 0, 12, gracia_default,
-                    key=f"gracia_{rol}", help=f"Meses sin pago para {rol}"
-                )
-    
-    # Sección 4: Costos Operativos
-    with st.expander("💳 COSTOS OPERATIVOS"):
-        st.markdown("**Costos Fijos Mensuales**")
-        infraestructura = st.number_input("☁️ Infraestructura/Hosting", 0, 20000, 200)
-        legales = st.number_input("⚖️ Legales/Contabilidad", 0, 10000, 100)
-        appstore = st.number_input("📱 Comisiones App Stores", 0, 10000, 500)
-        marketing = st.number_input("📢 Marketing/Publicidad", 0, 20000, 500)
-        otros = st.number_input("📦 Otros gastos fijos", 0, 10000, 300)
+                usuarios_basica_inicio = st.number_input("👤 Básicos iniciales", 0, 50000, 30)
         
-        costos_fijos = {
-            'infraestructura': infraestructura,
-            'legales': legales,
-            'appstore': appstore,
-            'marketing': marketing,
-            'otros': otros,
-            'total': infraestructura + legales + appstore + marketing + otros
-        }
+        # Sección 3: Equipo y Sueldos
+        with st.expander("👨‍💼 EQUIPO Y NÓMINA"):
+            # Una sola tabla editable para todo el equipo en lugar de dos campos por rol
+            equipo = st.data_editor(
+                pd.DataFrame({
+                    'Rol': [rol for rol, _, _ in _ROLES],
+                    'Sueldo': [sueldo for _, _, sueldo in _ROLES],
+                    'Gracia': [0] * len(_ROLES)
+                }),
+                column_config={
+                    'Rol': st.column_config.TextColumn("Rol", disabled=True),
+                    'Sueldo': st.column_config.NumberColumn(
+                        "Sueldo", min_value=0, max_value=20000, step=1, required=True,
+                        help="Sueldo mensual por persona en el rol"
+                    ),
+                    'Gracia': st.column_config.NumberColumn(
+                        "Gracia (meses)", min_value=0, max_value=12, step=1, required=True,
+                        help="Meses sin pago para el rol"
+                    )
+                },
+                num_rows='fixed',
+                hide_index=True,
+                key="equipo"
+            )
+            sueldos = {rol: int(sueldo) for rol, sueldo in zip(equipo['Rol'], equipo['Sueldo'])}
+            gracia = {rol: int(meses_gracia) for rol, meses_gracia in zip(equipo['Rol'], equipo['Gracia'])}
         
-        st.markdown("**Costos Variables**")
-        costo_variable = st.number_input("👥 Costo por usuario/mes", 0.0, 50.0, 2.5, 
-                                       step=0.1, help="Costo variable por usuario activo")
-    
-    # Sección 5: Financiamiento
-    with st.expander("🏦 FINANCIAMIENTO E IMPUESTOS"):
-        inversion_inicial = st.number_input("💵 Inversión inicial ($)", 0, 500000, 2500,
-                                          help="Capital inicial disponible")
-        tasa_impuestos = st.slider("🏛️ Tasa de impuestos (%)", 0.0, 50.0, 0.0, 
-                                 step=0.5, help="Tasa impositiva sobre utilidades")
+        # Sección 4: Costos Operativos
+        with st.expander("💳 COSTOS OPERATIVOS"):
+            st.markdown("**Costos Fijos Mensuales**")
+            infraestructura = st.number_input("☁️ Infraestructura/Hosting", 0, 20000, 200)
+            legales = st.number_input("⚖️ Legales/Contabilidad", 0, 10000, 100)
+            appstore = st.number_input("📱 Comisiones App Stores", 0, 10000, 500)
+            marketing = st.number_input("📢 Marketing/Publicidad", 0, 20000, 500)
+            otros = st.number_input("📦 Otros gastos fijos", 0, 10000, 300)
+            
+            costos_fijos = CostosFijos(infraestructura, legales, appstore, marketing, otros)
+            
+            st.markdown("**Costos Variables**")
+            costo_variable = st.number_input("👥 Costo por usuario/mes", 0.0, 50.0, 2.5, 
+                                           step=0.1, help="Costo variable por usuario activo")
+        
+        # Sección 5: Financiamiento
+        with st.expander("🏦 FINANCIAMIENTO E IMPUESTOS"):
+            inversion_inicial = st.number_input("💵 Inversión inicial ($)", 0, 500000, 2500,
+                                              help="Capital inicial disponible")
+            tasa_impuestos = st.slider("🏛️ Tasa de impuestos (%)", 0.0, 50.0, 0.0, 
+                                     step=0.5, help="Tasa impositiva sobre utilidades")
+        
+        st.form_submit_button("🔄 Actualizar proyección")
 
 # ================================
 # VALIDACIONES
@@ -450,14 +680,42 @@ if warnings:
 # CÁLCULOS PRINCIPALES
 # ================================
 
+# Los diccionarios se pasan como tuplas ordenadas para que la clave de caché
+# sea estable e independiente del orden de inserción
+sueldos_items = tuple(sorted(sueldos.items()))
+gracia_items = tuple(sorted(gracia.items()))
+
 with st.spinner("Calculando proyección financiera..."):
     df = calcular_proyeccion_financiera(
         meses, usuarios_premium_inicio, usuarios_basica_inicio,
         precio_premium, precio_basica, crecimiento_mensual,
-        sueldos, gracia, costos_fijos, costo_variable,
+        sueldos_items, gracia_items, costos_fijos, costo_variable,
         inversion_inicial, tasa_impuestos
     )
 
+# Primer mes rentable, compartido por el resumen, el análisis y el reporte exportado
+fila_break_even = _break_even(df)
+
+# Valores del último mes, leídos una sola vez para el resumen y el reporte exportado
+ultimo_mes = df.iloc[-1:].to_dict('records')[0]
+usuarios_iniciales = usuarios_premium_inicio + usuarios_basica_inicio
+
+# Estado del negocio según flujo y utilidad del último mes (ver _ESTADO_HTML)
+if ultimo_mes['Utilidad_Neta'] > 0:
+    estado_negocio = 0 if ultimo_mes['Efectivo_Acumulado'] > 0 else 1
+else:
+    estado_negocio = 2
+
+# Columnas que se consultan en varias pestañas, como arreglos de NumPy
+mes_arr = df['Mes'].to_numpy()
+efectivo_arr = df['Efectivo_Acumulado'].to_numpy()
+utilidad_arr = df['Utilidad_Neta'].to_numpy()
+
+# Indicadores de riesgo, usados en el análisis avanzado y en el reporte exportado
+meses_negativos = int(np.count_nonzero(utilidad_arr < 0))
+max_perdida = float(utilidad_arr.min())
+efectivo_minimo = float(efectivo_arr.min())
+
 # ================================
 # DASHBOARD PRINCIPAL
 # ================================
@@ -477,82 +735,60 @@ with tab1:
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric(
-            "👥 Usuarios Finales", 
-            f"{df['Total_Usuarios'].iloc[-1]:,.0f}",
-            delta=f"+{df['Total_Usuarios'].iloc[-1] - (usuarios_premium_inicio + usuarios_basica_inicio):,.0f}"
-        )
-        st.markdown('</div>', unsafe_allow_html=True)
+        with st.container(border=True):
+            st.metric(
+                "👥 Usuarios Finales", 
+                f"{ultimo_mes['Total_Usuarios']:,.0f}",
+                delta=f"+{ultimo_mes['Total_Usuarios'] - usuarios_iniciales:,.0f}"
+            )
         
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        crecimiento_total = ((df['Total_Usuarios'].iloc[-1] / (usuarios_premium_inicio + usuarios_basica_inicio)) - 1) * 100
-        st.metric("📈 Crecimiento Total", f"{crecimiento_total:.0f}%")
-        st.markdown('</div>', unsafe_allow_html=True)
+        with st.container(border=True):
+            crecimiento_total = ((ultimo_mes['Total_Usuarios'] / usuarios_iniciales) - 1) * 100
+            st.metric("📈 Crecimiento Total", f"{crecimiento_total:.0f}%")
     
     with col2:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric(
-            "💰 Ingresos Mensuales", 
-            f"${df['Ingresos_Totales'].iloc[-1]:,.0f}",
-            delta=f"${df['Ingresos_Totales'].iloc[-1] - df['Ingresos_Totales'].iloc[0]:,.0f}"
-        )
-        st.markdown('</div>', unsafe_allow_html=True)
+        with st.container(border=True):
+            st.metric(
+                "💰 Ingresos Mensuales", 
+                f"${ultimo_mes['Ingresos_Totales']:,.0f}",
+                delta=f"${ultimo_mes['Ingresos_Totales'] - df['Ingresos_Totales'].iat[0]:,.0f}"
+            )
         
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("💸 Costos Mensuales", f"${df['Costos_Totales'].iloc[-1]:,.0f}")
-        st.markdown('</div>', unsafe_allow_html=True)
+        with st.container(border=True):
+            st.metric("💸 Costos Mensuales", f"${ultimo_mes['Costos_Totales']:,.0f}")
     
     with col3:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        utilidad_final = df['Utilidad_Neta'].iloc[-1]
-        delta_color = "normal" if utilidad_final >= 0 else "inverse"
-        st.metric(
-            "🎯 Utilidad Mensual Final", 
-            f"${abs(utilidad_final):,.0f}",
-            delta=f"{'Positiva' if utilidad_final >= 0 else 'Negativa'}",
-            delta_color=delta_color
-        )
-        st.markdown('</div>', unsafe_allow_html=True)
+        with st.container(border=True):
+            utilidad_final = ultimo_mes['Utilidad_Neta']
+            delta_color = "normal" if utilidad_final >= 0 else "inverse"
+            st.metric(
+                "🎯 Utilidad Mensual Final", 
+                f"${abs(utilidad_final):,.0f}",
+                delta=f"{'Positiva' if utilidad_final >= 0 else 'Negativa'}",
+                delta_color=delta_color
+            )
         
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("📊 Margen Neto Final", f"{df['Margen_Neto'].iloc[-1]:.1%}")
-        st.markdown('</div>', unsafe_allow_html=True)
+        with st.container(border=True):
+            st.metric("📊 Margen Neto Final", f"{ultimo_mes['Margen_Neto']:.1%}")
     
     with col4:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        efectivo_final = df['Efectivo_Acumulado'].iloc[-1]
-        st.metric(
-            "💵 Efectivo Acumulado", 
-            f"${abs(efectivo_final):,.0f}",
-            delta=f"{'Positivo' if efectivo_final >= 0 else 'Negativo'}",
-            delta_color="normal" if efectivo_final >= 0 else "inverse"
-        )
-        st.markdown('</div>', unsafe_allow_html=True)
+        with st.container(border=True):
+            efectivo_final = ultimo_mes['Efectivo_Acumulado']
+            st.metric(
+                "💵 Efectivo Acumulado", 
+                f"${abs(efectivo_final):,.0f}",
+                delta=f"{'Positivo' if efectivo_final >= 0 else 'Negativo'}",
+                delta_color="normal" if efectivo_final >= 0 else "inverse"
+            )
         
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("🚀 ROI Total", f"{df['ROI_Acumulado'].iloc[-1]:.1%}")
-        st.markdown('</div>', unsafe_allow_html=True)
+        with st.container(border=True):
+            st.metric("🚀 ROI Total", f"{ultimo_mes['ROI_Acumulado']:.1%}")
     
     # Reporte ejecutivo con explicación del impacto de la inversión inicial
-    st.markdown(generar_reporte_ejecutivo(df), unsafe_allow_html=True)
+    st.markdown(generar_reporte_ejecutivo(df, fila_break_even, ultimo_mes), unsafe_allow_html=True)
     
     # Estado del negocio según flujo e utilidad
-    if df['Efectivo_Acumulado'].iloc[-1] > 0 and df['Utilidad_Neta'].iloc[-1] > 0:
-        st.markdown(
-            '<div class="alert-success">✅ <strong>Estado: SALUDABLE</strong> - El modelo es rentable y sostenible.</div>',
-            unsafe_allow_html=True
-        )
-    elif df['Utilidad_Neta'].iloc[-1] > 0:
-        st.markdown(
-            '<div class="alert-success">⚠️ <strong>Estado: EN CRECIMIENTO</strong> - Rentable pero requiere gestión de capital.</div>',
-            unsafe_allow_html=True
-        )
-    else:
-        st.markdown(
-            '<div class="alert-danger">🚨 <strong>Estado: REQUIERE AJUSTES</strong> - El modelo necesita optimización.</div>',
-            unsafe_allow_html=True
-        )
+    st.markdown(_ESTADO_HTML[estado_negocio], unsafe_allow_html=True)
 
 # ================================
 # TAB 2: VISUALIZACIONES
@@ -561,42 +797,13 @@ with tab2:
     st.markdown("### 📊 ANÁLISIS VISUAL INTERACTIVO")
     
     fig1, fig2, fig3 = crear_graficos_principales(df)
-    st.plotly_chart(fig1, use_container_width=True)
-    st.plotly_chart(fig2, use_container_width=True)
-    st.plotly_chart(fig3, use_container_width=True)
+    st.plotly_chart(fig1, use_container_width=True, key="grafico_financiero")
+    st.plotly_chart(fig2, use_container_width=True, key="grafico_usuarios")
+    st.plotly_chart(fig3, use_container_width=True, key="grafico_rentabilidad")
     
     st.markdown("### 💰 ANÁLISIS DE FLUJO DE EFECTIVO")
-    fig4 = go.Figure()
-    
-    positive_mask = df['Efectivo_Acumulado'] >= 0
-    negative_mask = df['Efectivo_Acumulado'] < 0
-    
-    if positive_mask.any():
-        fig4.add_trace(go.Scatter(
-            x=df.loc[positive_mask, 'Mes'],
-            y=df.loc[positive_mask, 'Efectivo_Acumulado'],
-            fill='tozeroy', fillcolor='rgba(40, 167, 69, 0.3)',
-            line=dict(color='#28a745'), name='Efectivo Positivo',
-            hovertemplate='<b>Efectivo Acumulado</b><br>Mes %{x}<br>$%{y:,.0f}<extra></extra>'
-        ))
-    if negative_mask.any():
-        fig4.add_trace(go.Scatter(
-            x=df.loc[negative_mask, 'Mes'],
-            y=df.loc[negative_mask, 'Efectivo_Acumulado'],
-            fill='tozeroy', fillcolor='rgba(220, 53, 69, 0.3)',
-            line=dict(color='#dc3545'), name='Efectivo Negativo',
-            hovertemplate='<b>Efectivo Acumulado</b><br>Mes %{x}<br>$%{y:,.0f}<extra></extra>'
-        ))
-    fig4.add_hline(y=0, line_dash="dash", line_color="black", opacity=0.5)
-    fig4.update_layout(
-        title='💰 Evolución del Flujo de Efectivo Acumulado',
-        xaxis_title='Mes',
-        yaxis_title='Efectivo Acumulado (USD)',
-        template='plotly_white',
-        height=400,
-        showlegend=True
-    )
-    st.plotly_chart(fig4, use_container_width=True)
+    fig4 = crear_grafico_flujo_efectivo(mes_arr, efectivo_arr)
+    st.plotly_chart(fig4, use_container_width=True, key="grafico_flujo_efectivo")
 
 # ================================
 # TAB 3: DATOS DETALLADOS
@@ -604,17 +811,20 @@ with tab2:
 with tab3:
     st.markdown("### 🧮 DATOS DETALLADOS (Con Costo de Inversión Inicial)")
     
+    # Las dos listas de meses comparten las mismas opciones
+    opciones_meses = range(1, meses + 1)
+    
     col1, col2, col3 = st.columns(3)
     with col1:
         mostrar_desde = st.selectbox(
             "Mostrar desde mes:", 
-            options=list(range(1, meses + 1)), 
+            options=opciones_meses, 
             index=0
         )
     with col2:
         mostrar_hasta = st.selectbox(
             "Mostrar hasta mes:", 
-            options=list(range(1, meses + 1)), 
+            options=opciones_meses, 
             index=min(11, meses - 1)
         )
     with col3:
@@ -623,34 +833,32 @@ with tab3:
             ["Completos", "Miles (K)", "Millones (M)"]
         )
     
-    # Filtrar y añadir columna de inversión inicial
-    df_filtered = df[(df['Mes'] >= mostrar_desde) & (df['Mes'] <= mostrar_hasta)].copy()
-    df_filtered['Costo_Inversion_Inicial'] = inversion_inicial
-    
-    # Ajustar formato
-    if formato_numeros == "Miles (K)":
-        cols_num = ['Ingresos_Totales', 'Costos_Totales', 'Utilidad_Neta', 
-                    'Efectivo_Acumulado', 'Costos_Personal', 'Costos_Variables', 'Costo_Inversion_Inicial']
-        for col in cols_num:
-            if col in df_filtered.columns:
-                df_filtered[col] = (df_filtered[col] / 1000).round(1)
-    elif formato_numeros == "Millones (M)":
-        cols_num = ['Ingresos_Totales', 'Costos_Totales', 'Utilidad_Neta', 
-                    'Efectivo_Acumulado', 'Costos_Personal', 'Costos_Variables', 'Costo_Inversion_Inicial']
-        for col in cols_num:
-            if col in df_filtered.columns:
-                df_filtered[col] = (df_filtered[col] / 1_000_000).round(2)
+    # Filtrar y añadir columna de inversión inicial (Mes va de 1 a meses, fila = Mes - 1)
+    df_filtered = df.iloc[mostrar_desde - 1:mostrar_hasta].assign(Costo_Inversion_Inicial=inversion_inicial)
+    
+    # Ajustar formato: una sola división sobre todas las columnas monetarias
+    if formato_numeros != "Completos":
+        divisor, decimales = (1000, 1) if formato_numeros == "Miles (K)" else (1_000_000, 2)
+        cols_formato = list(_COLS_FORMATO)
+        df_filtered[cols_formato] = np.round(df_filtered[cols_formato].to_numpy() / divisor, decimales)
+    
+    # Con tres meses o menos el degradado no aporta y se omite el Styler
+    if mostrar_hasta - mostrar_desde < 3:
+        tabla = df_filtered
+    else:
+        tabla = df_filtered.style.background_gradient(subset=['Utilidad_Neta'], cmap='RdYlGn')
     
     # Mostrar tabla y descripción
     st.dataframe(
-        df_filtered.style.format({
-            'Margen_Bruto': '{:.1%}',
-            'Margen_Neto': '{:.1%}',
-            'ROI_Acumulado': '{:.1%}',
-            'Usuarios_Premium': '{:,.0f}',
-            'Usuarios_Basicos': '{:,.0f}',
-            'Total_Usuarios': '{:,.0f}'
-        }).background_gradient(subset=['Utilidad_Neta'], cmap='RdYlGn'),
+        tabla,
+        column_config={
+            'Margen_Bruto': st.column_config.NumberColumn(format='percent'),
+            'Margen_Neto': st.column_config.NumberColumn(format='percent'),
+            'ROI_Acumulado': st.column_config.NumberColumn(format='percent'),
+            'Usuarios_Premium': st.column_config.NumberColumn(format='%,d'),
+            'Usuarios_Basicos': st.column_config.NumberColumn(format='%,d'),
+            'Total_Usuarios': st.column_config.NumberColumn(format='%,d')
+        },
         use_container_width=True,
         height=400
     )
@@ -663,22 +871,13 @@ with tab3:
     """)
     
     st.markdown("### 📊 ESTADÍSTICAS DESCRIPTIVAS")
+    stats_df, stats_df2 = calcular_estadisticas(df)
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("**Ingresos y Costos**")
-        stats_df = pd.DataFrame({
-            'Ingresos Totales': df['Ingresos_Totales'].describe(),
-            'Costos Totales': df['Costos_Totales'].describe(),
-            'Utilidad Neta': df['Utilidad_Neta'].describe()
-        }).round(0)
         st.dataframe(stats_df)
     with col2:
         st.markdown("**Usuarios y Métricas**")
-        stats_df2 = pd.DataFrame({
-            'Total Usuarios': df['Total_Usuarios'].describe(),
-            'Margen Bruto (%)': (df['Margen_Bruto'] * 100).describe(),
-            'ROI Acumulado (%)': (df['ROI_Acumulado'] * 100).describe()
-        }).round(1)
         st.dataframe(stats_df2)
 
 # ================================
@@ -688,10 +887,10 @@ with tab4:
     st.markdown("### 🎯 ANÁLISIS DE SENSIBILIDAD Y ESCENARIOS")
     
     st.markdown("#### ⚖️ Análisis de Punto de Equilibrio")
-    try:
-        break_even_mes = df[df['Utilidad_Neta'] > 0]['Mes'].iloc[0]
-        break_even_usuarios = df[df['Mes'] == break_even_mes]['Total_Usuarios'].iloc[0]
-        break_even_ingresos = df[df['Mes'] == break_even_mes]['Ingresos_Totales'].iloc[0]
+    if fila_break_even is not None:
+        break_even_mes = mes_arr[fila_break_even]
+        break_even_usuarios = df['Total_Usuarios'].iat[fila_break_even]
+        break_even_ingresos = df['Ingresos_Totales'].iat[fila_break_even]
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -700,7 +899,7 @@ with tab4:
             st.metric("👥 Usuarios necesarios", f"{break_even_usuarios:,.0f}")
         with col3:
             st.metric("💰 Ingresos necesarios", f"${break_even_ingresos:,.0f}")
-    except IndexError:
+    else:
         st.warning("⚠️ No se alcanza el punto de equilibrio en el período proyectado")
         costos_promedio = df['Costos_Totales'].mean()
         precio_promedio = (precio_premium + precio_basica) / 2
@@ -710,59 +909,16 @@ with tab4:
     st.markdown("#### 📊 Análisis de Sensibilidad")
     sensibilidad_param = st.selectbox(
         "Seleccionar parámetro para análisis:",
-        ["Precio Premium", "Precio Básico", "Crecimiento Mensual", "Costo Variable"]
+        list(_SENSIBILIDAD)
     )
-    if sensibilidad_param == "Precio Premium":
-        base_value = precio_premium
-        range_values = np.linspace(base_value * 0.5, base_value * 1.5, 11)
-        param_key = 'precio_premium'
-    elif sensibilidad_param == "Precio Básico":
-        base_value = precio_basica
-        range_values = np.linspace(base_value * 0.5, base_value * 1.5, 11)
-        param_key = 'precio_basica'
-    elif sensibilidad_param == "Crecimiento Mensual":
-        base_value = crecimiento_mensual * 100
-        range_values = np.linspace(0, base_value * 2, 11)
-        param_key = 'crecimiento_mensual'
-    else:
-        base_value = costo_variable
-        range_values = np.linspace(0, base_value * 2, 11)
-        param_key = 'costo_variable'
-    
-    sensibilidad_results = []
-    for value in range_values:
-        temp_params = {
-            'meses': meses,
-            'usuarios_premium_inicio': usuarios_premium_inicio,
-            'usuarios_basica_inicio': usuarios_basica_inicio,
-            'precio_premium': precio_premium,
-            'precio_basica': precio_basica,
-            'crecimiento_mensual': crecimiento_mensual,
-            'sueldos': sueldos,
-            'gracia': gracia,
-            'costos_fijos': costos_fijos,
-            'costo_variable': costo_variable,
-            'inversion_inicial': inversion_inicial,
-            'tasa_impuestos': tasa_impuestos
-        }
-        if param_key == 'precio_premium':
-            temp_params['precio_premium'] = value
-        elif param_key == 'precio_basica':
-            temp_params['precio_basica'] = value
-        elif param_key == 'crecimiento_mensual':
-            temp_params['crecimiento_mensual'] = value / 100
-        else:
-            temp_params['costo_variable'] = value
-        
-        temp_df = calcular_proyeccion_financiera(**temp_params)
-        sensibilidad_results.append({
-            'Parámetro': value,
-            'Utilidad_Final': temp_df['Utilidad_Neta'].iloc[-1],
-            'Efectivo_Final': temp_df['Efectivo_Acumulado'].iloc[-1],
-            'ROI_Final': temp_df['ROI_Acumulado'].iloc[-1]
-        })
+    param_key, factor_desde, factor_hasta = _SENSIBILIDAD[sensibilidad_param]
     
-    sens_df = pd.DataFrame(sensibilidad_results)
+    sens_df = calcular_sensibilidad(
+        param_key, factor_desde, factor_hasta, meses, usuarios_premium_inicio, usuarios_basica_inicio,
+        precio_premium, precio_basica, crecimiento_mensual,
+        sueldos_items, gracia_items, costos_fijos, costo_variable,
+        inversion_inicial, tasa_impuestos
+    )
     fig_sens = go.Figure()
     fig_sens.add_trace(go.Scatter(
         x=sens_df['Parámetro'],
@@ -780,24 +936,21 @@ with tab4:
         template='plotly_white',
         height=400
     )
-    st.plotly_chart(fig_sens, use_container_width=True)
+    st.plotly_chart(fig_sens, use_container_width=True, key="grafico_sensibilidad")
     
     st.markdown("**Resultados del Análisis de Sensibilidad**")
     st.dataframe(
-        sens_df.style.format({
-            'Parámetro': '{:.2f}',
-            'Utilidad_Final': '${:,.0f}',
-            'Efectivo_Final': '${:,.0f}',
-            'ROI_Final': '{:.1%}'
-        }).background_gradient(subset=['Utilidad_Final'], cmap='RdYlGn'),
+        sens_df.style.background_gradient(subset=['Utilidad_Final'], cmap='RdYlGn'),
+        column_config={
+            'Parámetro': st.column_config.NumberColumn(format='%.2f'),
+            'Utilidad_Final': st.column_config.NumberColumn(format='$%,.0f'),
+            'Efectivo_Final': st.column_config.NumberColumn(format='$%,.0f'),
+            'ROI_Final': st.column_config.NumberColumn(format='percent')
+        },
         use_container_width=True
     )
     
     st.markdown("#### ⚠️ Análisis de Riesgos")
-    meses_negativos = len(df[df['Utilidad_Neta'] < 0])
-    max_perdida = df['Utilidad_Neta'].min()
-    efectivo_minimo = df['Efectivo_Acumulado'].min()
-    
     col1, col2, col3 = st.columns(3)
     with col1:
         st.metric("📉 Meses con pérdidas", meses_negativos)
@@ -816,49 +969,48 @@ with tab4:
 # ================================
 # TAB 5: EXPORTAR
 # ================================
-with tab5:
+@st.fragment
+def mostrar_exportacion(
+    df, meses, usuarios_premium_inicio, usuarios_basica_inicio,
+    precio_premium, precio_basica, crecimiento_mensual,
+    sueldos, gracia, costos_fijos, costo_variable,
+    inversion_inicial, tasa_impuestos, cuerpo_reporte
+):
+    """Muestra las descargas; al pulsar un botón solo se vuelve a ejecutar esta sección"""
+    
     st.markdown("### 📤 EXPORTAR RESULTADOS")
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown("#### 📊 Exportar Datos")
-        export_df = df.copy()
-        export_df['Fecha'] = pd.date_range(start='2024-01-01', periods=len(export_df), freq='M')
+        export_df = df.assign(Fecha=fechas_proyeccion(meses))
         
         # CSV
-        csv_buffer = BytesIO()
-        export_df.to_csv(csv_buffer, index=False, encoding='utf-8')
-        csv_buffer.seek(0)
         st.download_button(
             label="📥 Descargar CSV",
-            data=csv_buffer.getvalue(),
+            data=generar_csv(export_df),
             file_name=f"jobmatch_proyeccion_{datetime.now().strftime('%Y%m%d')}.csv",
             mime="text/csv",
             help="Descarga todos los datos en formato CSV"
         )
         
         # Excel con hojas
-        excel_buffer = BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            export_df.to_excel(writer, sheet_name='Proyección Financiera', index=False)
-            params_df = pd.DataFrame({
-                'Parámetro': [
-                    'Duración (meses)', 'Usuarios Premium Inicial', 'Usuarios Básicos Inicial',
-                    'Precio Premium', 'Precio Básico', 'Crecimiento Mensual (%)',
-                    'Inversión Inicial', 'Tasa Impuestos (%)', 'Costo Variable'
-                ],
-                'Valor': [
-                    meses, usuarios_premium_inicio, usuarios_basica_inicio,
-                    precio_premium, precio_basica, crecimiento_mensual * 100,
-                    inversion_inicial, tasa_impuestos, costo_variable
-                ]
-            })
-            params_df.to_excel(writer, sheet_name='Parámetros', index=False)
-        excel_buffer.seek(0)
+        params_df = pd.DataFrame({
+            'Parámetro': [
+                'Duración (meses)', 'Usuarios Premium Inicial', 'Usuarios Básicos Inicial',
+                'Precio Premium', 'Precio Básico', 'Crecimiento Mensual (%)',
+                'Inversión Inicial', 'Tasa Impuestos (%)', 'Costo Variable'
+            ],
+            'Valor': [
+                meses, usuarios_premium_inicio, usuarios_basica_inicio,
+                precio_premium, precio_basica, crecimiento_mensual * 100,
+                inversion_inicial, tasa_impuestos, costo_variable
+            ]
+        })
         st.download_button(
             label="📊 Descargar Excel",
-            data=excel_buffer.getvalue(),
+            data=generar_excel(export_df, params_df),
             file_name=f"jobmatch_completo_{datetime.now().strftime('%Y%m%d')}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             help="Descarga datos completos en formato Excel con múltiples hojas"
@@ -869,47 +1021,7 @@ with tab5:
         reporte_completo = f"""
 # JOB MATCH - REPORTE FINANCIERO EJECUTIVO
 *Generado el {datetime.now().strftime('%d/%m/%Y %H:%M')}*
-
-## RESUMEN EJECUTIVO
-
-### Parámetros del Modelo
-- **Duración**: {meses} meses
-- **Usuarios iniciales**: {usuarios_premium_inicio:,} Premium + {usuarios_basica_inicio:,} Básicos
-- **Precios**: ${precio_premium} Premium / ${precio_basica} Básico
-- **Crecimiento mensual**: {crecimiento_mensual:.1%}
-- **Inversión inicial**: ${inversion_inicial:,}
-
-### Resultados Clave
-- **Usuarios finales proyectados**: {df['Total_Usuarios'].iloc[-1]:,}
-- **Ingresos mensuales finales**: ${df['Ingresos_Totales'].iloc[-1]:,}
-- **Utilidad mensual final**: ${df['Utilidad_Neta'].iloc[-1]:,}
-- **Efectivo acumulado final**: ${df['Efectivo_Acumulado'].iloc[-1]:,}
-- **ROI total**: {df['ROI_Acumulado'].iloc[-1]:.1%}
-- **Margen neto final**: {df['Margen_Neto'].iloc[-1]:.1%}
-
-### Punto de Equilibrio
-"""
-        try:
-            break_even_mes = df[df['Utilidad_Neta'] > 0]['Mes'].iloc[0]
-            reporte_completo += f"- **Mes de break-even**: {break_even_mes}\n"
-            reporte_completo += f"- **Usuarios necesarios**: {df[df['Mes'] == break_even_mes]['Total_Usuarios'].iloc[0]:,}\n"
-        except IndexError:
-            reporte_completo += "- **Break-even**: No alcanzado en el período\n"
-        
-        reporte_completo += f"""
-### Análisis de Riesgo
-- **Meses con pérdidas**: {len(df[df['Utilidad_Neta'] < 0])}
-- **Pérdida máxima mensual**: ${abs(df['Utilidad_Neta'].min()):,}
-- **Efectivo mínimo**: ${df['Efectivo_Acumulado'].min():,}
-
-### Recomendaciones
-"""
-        if df['Efectivo_Acumulado'].iloc[-1] > 0 and df['Utilidad_Neta'].iloc[-1] > 0:
-            reporte_completo += "✅ **Modelo financiero saludable y sostenible**\n"
-        elif df['Utilidad_Neta'].iloc[-1] > 0:
-            reporte_completo += "⚠️ **Modelo rentable pero requiere gestión de capital**\n"
-        else:
-            reporte_completo += "🚨 **Modelo requiere optimización urgente**\n"
+""" + cuerpo_reporte
         
         st.download_button(
             label="📄 Descargar Reporte MD",
@@ -933,13 +1045,38 @@ with tab5:
             },
             "sueldos": sueldos,
             "gracia": gracia,
-            "costos_fijos": costos_fijos,
+            "costos_fijos": {**costos_fijos._asdict(), "total": costos_fijos.total},
             "fecha_generacion": datetime.now().isoformat()
         }
         st.download_button(
             label="⚙️ Descargar Configuración",
-            data=json.dumps(config_json, indent=2, ensure_ascii=False),
+            data=serializar_configuracion(config_json),
             file_name=f"jobmatch_config_{datetime.now().strftime('%Y%m%d')}.json",
             mime="application/json",
             help="Descarga la configuración actual para reutilizar"
-        )
\ No newline at end of file
+        )
+
+# El cuerpo del reporte solo se vuelve a generar cuando cambian los resultados
+if fila_break_even is not None:
+    break_even = (int(mes_arr[fila_break_even]), int(df['Total_Usuarios'].iat[fila_break_even]))
+else:
+    break_even = None
+cuerpo_reporte = generar_reporte_md(
+    (
+        meses, usuarios_premium_inicio, usuarios_basica_inicio,
+        precio_premium, precio_basica, crecimiento_mensual, inversion_inicial
+    ),
+    (
+        ultimo_mes['Total_Usuarios'], ultimo_mes['Ingresos_Totales'], ultimo_mes['Utilidad_Neta'],
+        ultimo_mes['Efectivo_Acumulado'], ultimo_mes['ROI_Acumulado'], ultimo_mes['Margen_Neto']
+    ),
+    break_even, meses_negativos, max_perdida, efectivo_minimo, estado_negocio
+)
+
+with tab5:
+    mostrar_exportacion(
+        df, meses, usuarios_premium_inicio, usuarios_basica_inicio,
+        precio_premium, precio_basica, crecimiento_mensual,
+        sueldos, gracia, costos_fijos, costo_variable,
+        inversion_inicial, tasa_impuestos, cuerpo_reporte
+    )
\ No newline at end of file